@@ -1,11 +1,152 @@
+#!/usr/bin/env python3
+
 # Copyright (C) 2010-2013 Thomas Petazzoni <thomas.petazzoni@free-electrons.com>
 # Copyright (C) 2019 Yann E. MORIN <yann.morin.1998@free.fr>
 
+# Besides being used by the other scripts, this can be run from the top
+# directory of Buildroot, or from the output directory for out-of-tree
+# builds (O=...), to query the dependency graph of the configuration,
+# e.g.:
+#
+#   ./support/scripts/brpkgutil.py why host-python3
+#   ./support/scripts/brpkgutil.py impact libopenssl
+#
+# See '--help' for the available queries.
+
+import argparse
+import hashlib
 import json
 import logging
 import os
+import re
 import subprocess
-from collections import defaultdict
+import sys
+from collections import defaultdict, deque
+
+brpath = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# List of dependencies that all/many packages have, because of the
+# package infrastructures.
+MANDATORY_DEPS = ['toolchain', 'skeleton', 'host-skeleton', 'host-tar', 'host-gzip', 'host-ccache']
+
+# Cache of the output of 'make show-info', in the output directory
+SHOW_INFO_CACHE = ".show-info.json"
+
+BR2_EXTERNAL_DIRS_RE = re.compile(r"^BR2_EXTERNAL_DIRS \+= (.*)$", re.MULTILINE)
+PACKAGE_OVERRIDE_FILE_RE = re.compile(r'^BR2_PACKAGE_OVERRIDE_FILE="(.*)"$', re.MULTILINE)
+
+# Directories of the Buildroot tree holding the files read by make
+BR_MAKE_DIRS = ["arch", "boot", "fs", "linux", "package", "support", "system", "toolchain"]
+
+
+# Return the output directory, $(O). When called from the Buildroot
+# Makefile, it is exported as BASE_DIR; otherwise, the scripts run from
+# the directory holding the .config, which is $(O), except for in-tree
+# builds.
+def get_output_dir():
+    if os.environ.get("BASE_DIR"):
+        return os.environ["BASE_DIR"]
+    if os.path.realpath(os.getcwd()) == os.path.realpath(brpath):
+        return os.path.join(brpath, "output")
+    return os.getcwd()
+
+
+def read_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return b''
+
+
+# Return the path of the package override file set in the given
+# .config, with $(CONFIG_DIR) and $(TOPDIR) expanded, or None.
+def get_override_file(config, config_dir):
+    m = PACKAGE_OVERRIDE_FILE_RE.search(config.decode(errors='replace'))
+    path = m.group(1) if m else "$(CONFIG_DIR)/local.mk"
+    for var, value in [("CONFIG_DIR", config_dir), ("TOPDIR", brpath)]:
+        path = path.replace("$(%s)" % var, value).replace("${%s}" % var, value)
+    return path or None
+
+
+# Return the variables set on the make command line, which make passes
+# to the sub-makes after '--' in MAKEFLAGS.
+def get_make_cmdline_vars():
+    makeflags = os.environ.get("MAKEFLAGS", "")
+    if makeflags.startswith("-- "):
+        return makeflags[3:]
+    return makeflags.partition(" -- ")[2]
+
+
+# Return a key identifying the inputs of 'make show-info': the .config,
+# the package override file, the variables set on the make command line,
+# the br2-external trees, and the size and mtime of the .mk and
+# Config.in files of the Buildroot tree and of the br2-external trees.
+# Only the parts of the Buildroot tree that make reads are looked at, so
+# that output directories in the tree are not walked.
+def get_show_info_key(outdir):
+    h = hashlib.sha256()
+    config_file = os.environ.get("BR2_CONFIG", ".config")
+    config = read_file(config_file)
+    h.update(config)
+    override_file = get_override_file(config, os.path.dirname(os.path.abspath(config_file)))
+    if override_file:
+        h.update(override_file.encode() + b"\0" + read_file(override_file))
+    h.update(get_make_cmdline_vars().encode() + b"\0")
+    h.update(os.environ.get("BR2_EXTERNAL", "").encode())
+    br2_external = read_file(os.path.join(outdir, ".br2-external.mk"))
+    h.update(br2_external)
+
+    def add_file(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        h.update("{}:{}:{}\n".format(path, st.st_mtime_ns, st.st_size).encode())
+
+    for f in sorted(os.listdir(brpath)):
+        if f.startswith("Makefile") or f.startswith("Config.in"):
+            add_file(os.path.join(brpath, f))
+    tops = [os.path.join(brpath, d) for d in BR_MAKE_DIRS]
+    tops += BR2_EXTERNAL_DIRS_RE.findall(br2_external.decode(errors='replace'))
+    skip = os.path.realpath(outdir)
+    for top in tops:
+        for root, dirs, files in os.walk(top):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and
+                             os.path.realpath(os.path.join(root, d)) != skip)
+            for f in sorted(files):
+                if f.endswith(".mk") or f.startswith("Config.in") or f in ["Makefile", "external.desc"]:
+                    add_file(os.path.join(root, f))
+    return h.hexdigest()
+
+
+# Return the output of 'make show-info' as a dictionary. The output is
+# cached in the output directory, and reused as long as its key, from
+# get_show_info_key(), does not change.
+def get_show_info():
+    outdir = get_output_dir()
+    cache = os.path.join(outdir, SHOW_INFO_CACHE)
+    key = get_show_info_key(outdir)
+    try:
+        with open(cache, 'r') as f:
+            data = json.load(f)
+        if data.get("key") == key:
+            logging.info("Using cached show-info from {}".format(cache))
+            return data["info"]
+    except (OSError, ValueError):
+        pass
+
+    cmd = ["make", "-s", "--no-print-directory", "show-info"]
+    with open(os.devnull, 'wb') as devnull:
+        info = json.loads(subprocess.check_output(cmd, stderr=devnull, universal_newlines=True))
+
+    try:
+        with open(cache + ".tmp", 'w') as f:
+            json.dump({"key": key, "info": info}, f)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        pass
+    return info
 
 
 # This function returns a tuple of four dictionaries, all using package
@@ -30,11 +171,7 @@ def get_dependency_tree():
     types['all'] = 'target'
     versions['all'] = ''
 
-    cmd = ["make", "-s", "--no-print-directory", "show-info"]
-    with open(os.devnull, 'wb') as devnull:
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=devnull,
-                             universal_newlines=True)
-        pkg_list = json.loads(p.communicate()[0])
+    pkg_list = get_show_info()
 
     for pkg in pkg_list:
         deps['all'].append(pkg)
@@ -48,3 +185,259 @@ def get_dependency_tree():
             else pkg_list[pkg]["version"]
 
     return (deps, rdeps, types, versions)
+
+
+# Reachability index of a dependency graph, given as a dictionary of
+# the lists of dependencies of each package. Each package gets a bit
+# number, and the set of packages reachable from a package (its direct
+# and transitive dependencies) is stored as an integer bitset, computed
+# once for all packages in a single depth-first traversal. Testing
+# whether a package is a dependency of another one is then a bit test.
+class Reachability:
+    def __init__(self, deps):
+        self.index = {}
+        self.reach = {}
+        for root in deps:
+            if root in self.reach:
+                continue
+            # Packages being visited are marked with None, so that
+            # a loop does not make the traversal endless
+            self.reach[root] = None
+            stack = [(root, iter(deps.get(root, [])))]
+            while stack:
+                pkg, children = stack[-1]
+                for child in children:
+                    if child not in self.reach:
+                        self.reach[child] = None
+                        stack.append((child, iter(deps.get(child, []))))
+                        break
+                else:
+                    stack.pop()
+                    reach = 0
+                    for child in deps.get(pkg, []):
+                        reach |= self.bit(child) | (self.reach[child] or 0)
+                    self.reach[pkg] = reach
+
+    # Return the bitset holding only pkg
+    def bit(self, pkg):
+        try:
+            return 1 << self.index[pkg]
+        except KeyError:
+            self.index[pkg] = len(self.index)
+            return 1 << self.index[pkg]
+
+    # Return the bitset of the dependencies, direct or transitive, of pkg
+    def get_reach(self, pkg):
+        return self.reach.get(pkg) or 0
+
+    # Return True if pkg is a dependency (direct or transitive) of pkg2
+    def is_dep(self, pkg, pkg2):
+        return pkg in self.index and bool(self.get_reach(pkg2) & self.bit(pkg))
+
+    # Return the set of the packages of a bitset
+    def get_packages(self, bitset):
+        return {pkg for pkg, i in self.index.items() if bitset >> i & 1}
+
+
+# Return the strongly connected components of a dependency graph, given
+# as a dictionary of the lists of dependencies of each package, using
+# Tarjan's algorithm. The traversal is iterative, so it is not limited
+# by the recursion depth. Each component is a list of packages; the
+# components are returned dependencies first.
+def get_strongly_connected_components(deps):
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in deps:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(deps.get(root, [])))]
+        while work:
+            pkg, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(deps.get(child, []))))
+                    break
+                if child in on_stack:
+                    lowlink[pkg] = min(lowlink[pkg], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[pkg])
+                if lowlink[pkg] == index[pkg]:
+                    component = []
+                    while True:
+                        p = stack.pop()
+                        on_stack.discard(p)
+                        component.append(p)
+                        if p == pkg:
+                            break
+                    components.append(component)
+    return components
+
+
+# Return the dependency loops of a dependency graph: one loop for each
+# strongly connected component that has more than one package, or a
+# package depending on itself. Each loop is the shortest one going
+# through the first visited package of the component, given as a list
+# of packages, each one depending on the next one, and the last one
+# depending on the first one.
+def get_cycles(deps):
+    cycles = []
+    for component in get_strongly_connected_components(deps):
+        start = component[-1]
+        if len(component) == 1 and start not in deps.get(start, []):
+            continue
+        members = set(component)
+        parents = {}
+        queue = [start]
+        for pkg in queue:
+            if start in parents:
+                break
+            for child in deps.get(pkg, []):
+                if child in members and child not in parents:
+                    parents[child] = pkg
+                    queue.append(child)
+        cycle = [parents[start]]
+        while cycle[-1] != start:
+            cycle.append(parents[cycle[-1]])
+        cycles.append(list(reversed(cycle)))
+    return cycles
+
+
+# Queries on the dependency graph of the current configuration, as given
+# by 'make show-info'. The forward and reverse closures of all packages
+# are computed once, as reachability indexes.
+class DependencyGraph:
+    def __init__(self, show_info=None):
+        if show_info is None:
+            show_info = get_show_info()
+        self.types = {}
+        self.versions = {}
+        self.deps = {}
+        self.rdeps = defaultdict(list)
+        for pkg, info in show_info.items():
+            self.types[pkg] = info["type"]
+            self.versions[pkg] = \
+                None if info["type"] == "rootfs" \
+                else "virtual" if info["virtual"] \
+                else info["version"]
+            self.deps[pkg] = info.get("dependencies", [])
+            for d in self.deps[pkg]:
+                self.rdeps[d].append(pkg)
+        self.forward = Reachability(self.deps)
+        self.reverse = Reachability(self.rdeps)
+
+    def check(self, pkg):
+        if pkg not in self.types:
+            raise KeyError("unknown package '%s'" % pkg)
+
+    # Return the set of the dependencies, direct or transitive, of pkg
+    def get_closure(self, pkg):
+        self.check(pkg)
+        return self.forward.get_packages(self.forward.get_reach(pkg))
+
+    # Return the set of the packages depending, directly or transitively,
+    # on pkg: the packages to rebuild when pkg changes
+    def get_reverse_closure(self, pkg):
+        self.check(pkg)
+        return self.reverse.get_packages(self.reverse.get_reach(pkg))
+
+    # Return the packages no other package depends on: the ones enabled
+    # in the configuration, and the filesystems
+    def get_top_level(self):
+        return [pkg for pkg in self.types if not self.rdeps.get(pkg)]
+
+    # Return the shortest chain of dependencies leading from one of roots,
+    # by default a top-level package, to pkg, as a list of packages, each
+    # one depending on the next one. Returns None if there is no such
+    # chain.
+    def get_chain(self, pkg, roots=None):
+        self.check(pkg)
+        roots = set(self.get_top_level() if roots is None else roots)
+        parents = {pkg: None}
+        queue = deque([pkg])
+        while queue:
+            p = queue.popleft()
+            if p in roots:
+                chain = [p]
+                while parents[chain[-1]] is not None:
+                    chain.append(parents[chain[-1]])
+                return chain
+            for r in self.rdeps.get(p, []):
+                if r not in parents:
+                    parents[r] = p
+                    queue.append(r)
+        return None
+
+    # Return the target packages that depend on nothing but the
+    # toolchain and the other mandatory dependencies
+    def get_toolchain_only(self):
+        allowed = set(MANDATORY_DEPS)
+        if "toolchain" in self.types:
+            allowed |= self.get_closure("toolchain")
+        return [pkg for pkg in self.types
+                if self.types[pkg] == "target" and self.versions[pkg] != "virtual"
+                and pkg not in allowed and all(d in allowed for d in self.deps[pkg])]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the dependency graph of the current configuration")
+    parser.add_argument("--json", action="store_true",
+                        help="Output the result as JSON")
+    sub = parser.add_subparsers(dest="query", required=True)
+    why = sub.add_parser("why", help="Show the shortest chain of dependencies including PACKAGE")
+    why.add_argument("package", metavar="PACKAGE")
+    why.add_argument("--from", dest="roots", metavar="ROOT", action="append",
+                     help="Start the chain from ROOT instead of a top-level package (can be given multiple times)")
+    deps = sub.add_parser("deps", help="List the direct and transitive dependencies of PACKAGE")
+    deps.add_argument("package", metavar="PACKAGE")
+    rdeps = sub.add_parser("rdeps", help="List the packages depending directly or transitively on PACKAGE")
+    rdeps.add_argument("package", metavar="PACKAGE")
+    impact = sub.add_parser("impact", help="List the packages to rebuild when PACKAGE changes (same as rdeps)")
+    impact.add_argument("package", metavar="PACKAGE")
+    sub.add_parser("toolchain-only", help="List the target packages depending on nothing but the toolchain")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    graph = DependencyGraph()
+    try:
+        if args.query == "why":
+            result = graph.get_chain(args.package, args.roots)
+            if result is None:
+                logging.error("No chain of dependencies leads to '%s'" % args.package)
+                return 1
+        elif args.query == "deps":
+            result = sorted(graph.get_closure(args.package))
+        elif args.query in ["rdeps", "impact"]:
+            result = sorted(graph.get_reverse_closure(args.package))
+        elif args.query == "toolchain-only":
+            result = sorted(graph.get_toolchain_only())
+    except KeyError as e:
+        logging.error("Error: %s" % e.args[0])
+        return 1
+    if args.json:
+        json.dump(result, sys.stdout)
+        sys.stdout.write("\n")
+    elif args.query == "why":
+        print(" -> ".join(result))
+    else:
+        for pkg in result:
+            print(pkg)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stderr, format='%(message)s', level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Copyright (C) 2011 by Thomas Petazzoni <thomas.petazzoni@free-electrons.com>
+# Copyright (C) 2013 by Yann E. MORIN <yann.morin.1998@free.fr>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+
+# Parser for the $(O)/build/build-time.log file, in which Buildroot
+# records the start and the end of each step of each package, as lines
+# of the form:
+#
+#   <timestamp>:<start|end>:<step>:<package>
+#
+# The file is read line by line, and the packages and steps are looked
+# up in dictionaries, so that large logs are processed in linear time.
+# Each end is paired with the start of the same step before it, and
+# when a step was run several times, e.g. after a rebuild, its last
+# completed run is kept. A start with no end, e.g. of a step that was
+# interrupted, is ignored.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The steps of a package, in the order they are run
+STEPS = ['download', 'extract', 'patch', 'configure', 'build',
+         'install-target', 'install-staging', 'install-images',
+         'install-host']
+
+
+# Yields the (time, state, step, package) records of a build-time.log
+# file, skipping the empty lines.
+def parse(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        time, state, step, pkg = line.split(':', 3)
+        yield float(time), state.strip(), step.strip(), pkg.strip()
+
+
+class BuildTimeLog:
+    """
+    Timing data of a build, parsed from the lines of build-time.log.
+
+    The packages are listed in the order they were first seen in the
+    log, i.e. in build order, and the steps are the known STEPS followed
+    by any other step found in the log. The start, end and duration
+    properties are NumPy arrays of one row per package and one column
+    per step; the start and end of the steps that were not run, or not
+    completed, are NaN, and their duration is 0.
+    """
+    def __init__(self, lines):
+        self.packages = []
+        self.steps = list(STEPS)
+        self.pkg_index = {}
+        self.step_index = {step: i for i, step in enumerate(self.steps)}
+        self.starts = {}
+        self.ends = {}
+        pending = {}
+        self.first = self.last = None
+        self._arrays = None
+        for time, state, step, pkg in parse(lines):
+            p = self.pkg_index.get(pkg)
+            if p is None:
+                p = self.pkg_index[pkg] = len(self.packages)
+                self.packages.append(pkg)
+            s = self.step_index.get(step)
+            if s is None:
+                s = self.step_index[step] = len(self.steps)
+                self.steps.append(step)
+            if state == "start":
+                pending[(p, s)] = time
+            elif (p, s) in pending:
+                self.starts[(p, s)] = pending.pop((p, s))
+                self.ends[(p, s)] = time
+            if self.first is None or time < self.first:
+                self.first = time
+            if self.last is None or time > self.last:
+                self.last = time
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(f)
+
+    @property
+    def wall_clock(self):
+        """Duration between the first and the last record of the log"""
+        return self.last - self.first if self.first is not None else 0
+
+    def get_durations(self):
+        """
+        Return a dictionary of the total duration of each package, for
+        the packages with at least one completed step. Unlike the array
+        properties, this does not need NumPy.
+        """
+        durations = {}
+        for (p, s), end in self.ends.items():
+            pkg = self.packages[p]
+            durations[pkg] = durations.get(pkg, 0) + end - self.starts[(p, s)]
+        return durations
+
+    def _get_arrays(self):
+        if self._arrays is None:
+            if numpy is None:
+                raise ImportError("python-numpy is needed for the build time arrays")
+            shape = (len(self.packages), len(self.steps))
+            start = numpy.full(shape, numpy.nan)
+            end = numpy.full(shape, numpy.nan)
+            for times, array in [(self.starts, start), (self.ends, end)]:
+                if times:
+                    index = numpy.array(list(times.keys()))
+                    array[index[:, 0], index[:, 1]] = numpy.fromiter(times.values(), float, len(times))
+            duration = numpy.nan_to_num(end - start)
+            self._arrays = start, end, duration
+        return self._arrays
+
+    @property
+    def start(self):
+        return self._get_arrays()[0]
+
+    @property
+    def end(self):
+        return self._get_arrays()[1]
+
+    @property
+    def duration(self):
+        return self._get_arrays()[2]
+
+    def step_columns(self, steps=STEPS):
+        """Return the column indexes of the given steps"""
+        return [self.step_index[step] for step in steps]
@@ -17,14 +17,22 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 
+import argparse
+import concurrent.futures
 import datetime
+import functools
+import hashlib
+import json
 import os
+import re
 import requests  # URL checking
-import distutils.version
+import sqlite3
 import time
 import gzip
+import multiprocessing
 import sys
 import operator
+import zlib
 
 try:
     import ijson
@@ -44,6 +52,29 @@ NVD_START_YEAR = 2002
 NVD_JSON_VERSION = "1.1"
 NVD_BASE_URL = "https://nvd.nist.gov/feeds/json/cve/" + NVD_JSON_VERSION
 
+# NVD 2.0 API, used to incrementally sync the CVEs modified since the
+# previous sync. The modification date range of a request is limited to
+# NVD_API_MAX_DAYS, and the API asks for a delay between requests.
+NVD_API_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+NVD_API_MAX_DAYS = 120
+NVD_API_RESULTS_PER_PAGE = 2000
+NVD_API_DELAY = 6
+
+# Number of feeds downloaded concurrently
+NVD_DOWNLOAD_JOBS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Bump when the schema of the indexed NVD database changes
+NVD_DB_VERSION = 1
+NVD_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS years (year INTEGER PRIMARY KEY, digest TEXT);
+CREATE TABLE IF NOT EXISTS cves (id TEXT PRIMARY KEY, year INTEGER, data TEXT);
+CREATE INDEX IF NOT EXISTS cves_year ON cves (year);
+CREATE TABLE IF NOT EXISTS products (product TEXT, cve_id TEXT,
+                                     PRIMARY KEY (product, cve_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync (key TEXT PRIMARY KEY, value TEXT);
+"""
+
 ops = {
     '>=': operator.ge,
     '>': operator.gt,
@@ -53,14 +84,52 @@ ops = {
 }
 
 
+VERSION_COMPONENT_RE = re.compile(r'(\d+|[a-z]+|\.)')
+
+
+@functools.lru_cache(maxsize=None)
+def parse_version(version):
+    """
+    Split a version string in a tuple of integers and strings, the way
+    distutils' LooseVersion did. Returns None for an empty version.
+    """
+    if not version:
+        return None
+    components = []
+    for component in VERSION_COMPONENT_RE.split(version):
+        if not component or component == '.':
+            continue
+        try:
+            components.append(int(component))
+        except ValueError:
+            components.append(component)
+    return tuple(components)
+
+
+def version_cmp(version1, version2):
+    """
+    Compare two parsed versions like LooseVersion did: even an equality
+    check raises TypeError when the versions are different and an
+    integer is compared with a string.
+    """
+    if version1 == version2:
+        return 0
+    if version1 < version2:
+        return -1
+    return 1
+
+
+# Check if two split CPE IDs match each other
+def cpe_elems_match(cpe1_elems, cpe2_elems):
+    for elem1, elem2 in zip(cpe1_elems, cpe2_elems):
+        if elem1 != elem2 and elem1 not in ["*", "-"] and elem2 not in ["*", "-"]:
+            return False
+    return True
+
+
 # Check if two CPE IDs match each other
 def cpe_matches(cpe1, cpe2):
-    cpe1_elems = cpe1.split(":")
-    cpe2_elems = cpe2.split(":")
-
-    remains = filter(lambda x: x[0] not in ["*", "-"] and x[1] not in ["*", "-"] and x[0] != x[1],
-                     zip(cpe1_elems, cpe2_elems))
-    return len(list(remains)) == 0
+    return cpe_elems_match(cpe1.split(":"), cpe2.split(":"))
 
 
 def cpe_product(cpe):
@@ -71,6 +140,123 @@ def cpe_version(cpe):
     return cpe.split(':')[5]
 
 
+def parse_meta(text):
+    """Parse the content of an NVD .meta file into a dict"""
+    meta = dict()
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            meta[key.strip()] = value.strip()
+    return meta
+
+
+def download_file(url, path, sha256=None, gzipped=False):
+    """
+    Stream url to path. The data is written to path + '.part', which is
+    renamed into place once complete, so path is never left partially
+    written. A '.part' file left by an interrupted download is resumed
+    with a Range request, but only if the result can be verified: when
+    sha256 is given, or when the server validator (strong ETag or
+    Last-Modified) saved next to the '.part' is sent in If-Range, so
+    that the server sends the whole file again if it changed.
+
+    If sha256 is given, the data is verified on the fly against it, and
+    a mismatch raises ValueError. With gzipped, the sha256 is the one of
+    the uncompressed data, as given by the NVD .meta files.
+    """
+    path_part = path + ".part"
+    path_validator = path_part + ".validator"
+
+    def remove_part():
+        for f in [path_part, path_validator]:
+            if os.path.exists(f):
+                os.unlink(f)
+
+    for attempt in range(2):
+        digest = hashlib.sha256()
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+
+        def update(data):
+            digest.update(decompressor.decompress(data) if decompressor else data)
+
+        validator = None
+        if os.path.exists(path_validator):
+            with open(path_validator) as f:
+                validator = f.read().strip() or None
+        if os.path.exists(path_part) and not sha256 and not validator:
+            # Nothing to tell whether the .part is from the current
+            # version of the file
+            remove_part()
+        offset = os.path.getsize(path_part) if os.path.exists(path_part) else 0
+        headers = {}
+        if offset:
+            headers["Range"] = "bytes=%d-" % offset
+            if validator:
+                headers["If-Range"] = validator
+        try:
+            with requests.get(url, headers=headers, stream=True) as r:
+                if r.status_code == 416:
+                    # Nothing left to fetch, or a .part we cannot resume
+                    remove_part()
+                    continue
+                r.raise_for_status()
+                if r.status_code == 206:
+                    # Feed the data we already have to the digest
+                    with open(path_part, "rb") as f:
+                        for data in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                            update(data)
+                    mode = "ab"
+                else:
+                    # A fresh download, even when a range was asked for
+                    offset = 0
+                    mode = "wb"
+                    etag = r.headers.get("ETag")
+                    validator = etag if etag and not etag.startswith("W/") else r.headers.get("Last-Modified")
+                    if validator:
+                        with open(path_validator, "w") as f:
+                            f.write(validator)
+                    elif os.path.exists(path_validator):
+                        os.unlink(path_validator)
+                with open(path_part, mode) as f:
+                    for data in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(data)
+                        update(data)
+            if decompressor:
+                digest.update(decompressor.flush())
+        except zlib.error:
+            remove_part()
+            if offset:
+                # The resumed .part was from another version of the file
+                continue
+            raise ValueError("%s: invalid gzip data" % url)
+        if sha256 and digest.hexdigest() != sha256.lower():
+            remove_part()
+            if offset:
+                # The resumed .part was from another version of the file
+                continue
+            raise ValueError("%s: sha256 mismatch" % url)
+        os.replace(path_part, path)
+        if os.path.exists(path_validator):
+            os.unlink(path_validator)
+        return path
+    raise ValueError("%s: cannot download" % url)
+
+
+def open_nvd_db(nvd_dir):
+    """
+    Open the indexed NVD database of nvd_dir, creating it if needed,
+    and return its path and connection.
+    """
+    db_path = os.path.join(nvd_dir, "nvdcve-%s.db" % NVD_JSON_VERSION)
+    db = sqlite3.connect(db_path)
+    if db.execute("PRAGMA user_version").fetchone()[0] != NVD_DB_VERSION:
+        db.executescript("DROP TABLE IF EXISTS years; DROP TABLE IF EXISTS cves; "
+                         "DROP TABLE IF EXISTS products; DROP TABLE IF EXISTS sync; "
+                         "PRAGMA user_version = %d;" % NVD_DB_VERSION)
+    db.executescript(NVD_DB_SCHEMA)
+    return db_path, db
+
+
 class CVE:
     """An accessor class for CVE Items in NVD files"""
     CVE_AFFECTS = 1
@@ -80,6 +266,7 @@ class CVE:
     def __init__(self, nvd_cve):
         """Initialize a CVE from its NVD JSON representation"""
         self.nvd_cve = nvd_cve
+        self._ranges = None
 
     @staticmethod
     def download_nvd_year(nvd_path, year):
@@ -109,31 +296,235 @@ class CVE:
             if page_meta.text == meta_known:
                 return path_jsonf_gz
 
-        # Grab the compressed JSON NVD, and write files to disk
+        # Stream the compressed JSON NVD to disk, checking it against
+        # the sha256 of the uncompressed feed given by the meta file
         url = "%s/%s" % (NVD_BASE_URL, jsonf_gz)
         print("Getting %s" % url)
-        page_json = requests.get(url)
-        page_json.raise_for_status()
-        open(path_jsonf_gz, "wb").write(page_json.content)
-        open(path_metaf, "w").write(page_meta.text)
+        download_file(url, path_jsonf_gz, parse_meta(page_meta.text).get("sha256"), gzipped=True)
+        with open(path_metaf + ".tmp", "w") as f:
+            f.write(page_meta.text)
+        os.replace(path_metaf + ".tmp", path_metaf)
         return path_jsonf_gz
 
+    @staticmethod
+    def download_nvd(nvd_path):
+        """
+        Download the outdated yearly feeds concurrently, and return the
+        list of the feeds since NVD_START_YEAR.
+        """
+        years = range(NVD_START_YEAR, datetime.datetime.now().year + 1)
+        with concurrent.futures.ThreadPoolExecutor(NVD_DOWNLOAD_JOBS) as executor:
+            return list(executor.map(lambda year: CVE.download_nvd_year(nvd_path, year), years))
+
+    @staticmethod
+    def nvd_year_digest(nvd_path, year):
+        """
+        Return the sha256 of the feed of a year, as listed in its .meta
+        file, or the mtime and size of the feed if there is no .meta file.
+        """
+        path_metaf = os.path.join(nvd_path, "nvdcve-%s-%s.meta" % (NVD_JSON_VERSION, year))
+        path_jsonf_gz = os.path.join(nvd_path, "nvdcve-%s-%s.json.gz" % (NVD_JSON_VERSION, year))
+        if os.path.exists(path_metaf):
+            with open(path_metaf, "r") as f:
+                for line in f:
+                    if line.startswith("sha256:"):
+                        return line[7:].strip()
+        st = os.stat(path_jsonf_gz)
+        return "%d:%d" % (st.st_mtime_ns, st.st_size)
+
+    @classmethod
+    def read_nvd_year(cls, filename):
+        """Iterate over all the CVEs contained in one yearly feed"""
+        try:
+            content = ijson.items(gzip.GzipFile(filename), 'CVE_Items.item')
+        except:  # noqa: E722
+            print("ERROR: cannot read %s. Please remove the file then rerun this script" % filename)
+            raise
+        for cve in content:
+            yield cls(cve)
+
     @classmethod
-    def read_nvd_dir(cls, nvd_dir):
+    def read_nvd_dir(cls, nvd_dir, jobs=1):
         """
         Iterate over all the CVEs contained in NIST Vulnerability Database
         feeds since NVD_START_YEAR. If the files are missing or outdated in
         nvd_dir, a fresh copy will be downloaded, and kept in .json.gz
+
+        With jobs > 1, the yearly feeds are parsed in parallel by a pool
+        of processes, and only the parts of the CVEs used by this class
+        are kept.
+        """
+        filenames = CVE.download_nvd(nvd_dir)
+        if jobs <= 1:
+            for filename in filenames:
+                for cve in cls.read_nvd_year(filename):
+                    yield cve
+            return
+        for cves in parse_nvd_years(filenames, jobs):
+            for identifier, data, products in cves:
+                yield cls(json.loads(data))
+
+    def compact(self):
+        """
+        Return the parts of the NVD JSON representation used by this
+        class, as stored in the indexed database.
+        """
+        return {
+            'cve': {
+                'CVE_data_meta': self.nvd_cve['cve']['CVE_data_meta'],
+                'affects': self.nvd_cve['cve']['affects'],
+            },
+            'configurations': self.nvd_cve['configurations'],
+        }
+
+    @classmethod
+    def update_nvd_db(cls, nvd_dir, jobs=1):
+        """
+        Ingest the NVD feeds of nvd_dir in an sqlite database indexed by
+        CPE product, downloading them first if needed. Only the years
+        whose feed changed since the previous run, according to the
+        sha256 listed in their .meta file, are parsed again, by a pool of
+        jobs processes. Returns the path of the database.
+        """
+        db_path, db = open_nvd_db(nvd_dir)
+        feeds_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
+        outdated = []
+        years = range(NVD_START_YEAR, datetime.datetime.now().year + 1)
+        for year, filename in zip(years, CVE.download_nvd(nvd_dir)):
+            digest = CVE.nvd_year_digest(nvd_dir, year)
+            row = db.execute("SELECT digest FROM years WHERE year = ?", (year,)).fetchone()
+            if not row or row[0] != digest:
+                outdated.append((year, filename, digest))
+        cves_by_year = parse_nvd_years([filename for _, filename, _ in outdated], jobs)
+        for (year, filename, digest), cves in zip(outdated, cves_by_year):
+            print("Indexing %s" % filename)
+            with db:
+                db.execute("DELETE FROM products WHERE cve_id IN (SELECT id FROM cves WHERE year = ?)", (year,))
+                db.execute("DELETE FROM cves WHERE year = ?", (year,))
+                for identifier, data, products in cves:
+                    db.execute("INSERT OR REPLACE INTO cves VALUES (?, ?, ?)", (identifier, year, data))
+                    db.executemany("INSERT OR IGNORE INTO products VALUES (?, ?)",
+                                   [(product, identifier) for product in products])
+                db.execute("INSERT OR REPLACE INTO years VALUES (?, ?)", (year, digest))
+        # The feeds are at most a day old, and the CVEs of the years
+        # parsed again replaced the ones a previous sync may have updated
+        # since: the next incremental sync must start from there.
+        if outdated:
+            row = db.execute("SELECT value FROM sync WHERE key = 'last_modified'").fetchone()
+            if not row or datetime.datetime.fromisoformat(row[0]) > feeds_date:
+                with db:
+                    db.execute("INSERT OR REPLACE INTO sync VALUES ('last_modified', ?)", (feeds_date.isoformat(),))
+        db.close()
+        return db_path
+
+    @classmethod
+    def from_api(cls, vulnerability):
+        """
+        Initialize a CVE from its NVD 2.0 API representation, converted
+        to the parts of the JSON feed format used by this class.
+        """
+        cve = vulnerability['cve']
+        nodes = []
+        for configuration in cve.get('configurations', []):
+            config_nodes = [{
+                'operator': node.get('operator'),
+                'cpe_match': [{
+                    'vulnerable': match['vulnerable'],
+                    'cpe23Uri': match['criteria'],
+                    **{k: v for k, v in match.items() if k.startswith('version')}
+                } for match in node.get('cpeMatch', [])]
+            } for node in configuration.get('nodes', [])]
+            if configuration.get('operator') == 'AND':
+                nodes.append({'operator': 'AND', 'children': config_nodes})
+            else:
+                nodes += config_nodes
+        return cls({
+            'cve': {
+                'CVE_data_meta': {'ID': cve['id']},
+                'affects': {'vendor': {'vendor_data': []}},
+            },
+            'configurations': {'nodes': nodes},
+        })
+
+    @classmethod
+    def sync_nvd_db(cls, nvd_dir, api_url=NVD_API_URL, since=None, delay=NVD_API_DELAY):
+        """
+        Upsert in the indexed database of nvd_dir the CVEs modified since
+        the previous sync, or since the given datetime, as returned by the
+        lastModStartDate/lastModEndDate paging of an NVD 2.0 style API at
+        api_url. Returns the number of CVEs updated.
         """
-        for year in range(NVD_START_YEAR, datetime.datetime.now().year + 1):
-            filename = CVE.download_nvd_year(nvd_dir, year)
-            try:
-                content = ijson.items(gzip.GzipFile(filename), 'CVE_Items.item')
-            except:  # noqa: E722
-                print("ERROR: cannot read %s. Please remove the file then rerun this script" % filename)
-                raise
-            for cve in content:
-                yield cls(cve)
+        db_path, db = open_nvd_db(nvd_dir)
+        if since is None:
+            row = db.execute("SELECT value FROM sync WHERE key = 'last_modified'").fetchone()
+            if not row:
+                db.close()
+                raise ValueError("no previous sync in %s, ingest the NVD feeds first" % db_path)
+            since = datetime.datetime.fromisoformat(row[0])
+        end = datetime.datetime.now(datetime.timezone.utc)
+        headers = {}
+        if os.environ.get("NVD_API_KEY"):
+            headers['apiKey'] = os.environ["NVD_API_KEY"]
+        count = 0
+        while since < end:
+            window_end = min(since + datetime.timedelta(days=NVD_API_MAX_DAYS), end)
+            start_index = 0
+            while True:
+                if count or start_index:
+                    time.sleep(delay)
+                params = {
+                    'lastModStartDate': since.isoformat(timespec='milliseconds'),
+                    'lastModEndDate': window_end.isoformat(timespec='milliseconds'),
+                    'startIndex': start_index,
+                    'resultsPerPage': NVD_API_RESULTS_PER_PAGE,
+                }
+                print("Getting %s (%s)" % (api_url, ", ".join("%s=%s" % p for p in params.items())))
+                page = requests.get(api_url, params=params, headers=headers)
+                page.raise_for_status()
+                page = page.json()
+                with db:
+                    for vulnerability in page['vulnerabilities']:
+                        cve = cls.from_api(vulnerability)
+                        year = int(cve.identifier.split('-')[1])
+                        db.execute("DELETE FROM products WHERE cve_id = ?", (cve.identifier,))
+                        db.execute("INSERT OR REPLACE INTO cves VALUES (?, ?, ?)",
+                                   (cve.identifier, year, json.dumps(cve.compact(), default=str)))
+                        db.executemany("INSERT OR IGNORE INTO products VALUES (?, ?)",
+                                       [(product, cve.identifier) for product in cve.affected_products])
+                        count += 1
+                start_index += len(page['vulnerabilities'])
+                if not page['vulnerabilities'] or start_index >= page['totalResults']:
+                    break
+            since = window_end
+        with db:
+            db.execute("INSERT OR REPLACE INTO sync VALUES ('last_modified', ?)", (end.isoformat(),))
+        db.close()
+        return count
+
+    @classmethod
+    def read_nvd_db(cls, nvd_dir, products, jobs=1, api_url=None, update=True):
+        """
+        Iterate over the CVEs of the NIST Vulnerability Database referring
+        to at least one of the given CPE products, in the same order as
+        read_nvd_dir. Unless update is False, the indexed database in
+        nvd_dir is updated first, and then synced with the NVD 2.0 style
+        API at api_url, if given.
+        """
+        if update:
+            db_path = cls.update_nvd_db(nvd_dir, jobs)
+            if api_url:
+                cls.sync_nvd_db(nvd_dir, api_url)
+            db = sqlite3.connect(db_path)
+        else:
+            db_path, db = open_nvd_db(nvd_dir)
+        db.execute("CREATE TEMP TABLE wanted (product TEXT PRIMARY KEY)")
+        db.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", [(p,) for p in products])
+        query = """SELECT data FROM cves
+                   WHERE id IN (SELECT cve_id FROM products JOIN wanted USING (product))
+                   ORDER BY year, rowid"""
+        for (data,) in db.execute(query):
+            yield cls(json.loads(data))
+        db.close()
 
     def each_product(self):
         """Iterate over each product section of this cve"""
@@ -208,10 +599,38 @@ class CVE:
         """The CVE unique identifier"""
         return self.nvd_cve['cve']['CVE_data_meta']['ID']
 
+    def compile_ranges(self):
+        """
+        Precompile the vulnerable configurations of this CVE into the
+        list of their (cpe elements, start, end) ranges, in NVD order,
+        and index them by CPE product. start and end are None or
+        (operator, parsed version) tuples. This is only done once per
+        CVE.
+        """
+        if self._ranges is not None:
+            return self._ranges
+        self._ranges = dict()
+        self._all_ranges = []
+        for cpe in self.each_cpe():
+            elems = cpe['id'].split(':')
+            start = (ops[cpe['op_start']], parse_version(cpe['v_start'])) if cpe['v_start'] else None
+            end = (ops[cpe['op_end']], parse_version(cpe['v_end'])) if cpe['v_end'] else None
+            self._ranges.setdefault(elems[4], []).append((elems, start, end))
+            self._all_ranges.append((elems, start, end))
+        return self._ranges
+
+    def product_ranges(self, product):
+        """The precompiled ranges of this CVE that may apply to product"""
+        ranges = self.compile_ranges()
+        if '*' in ranges:
+            # A wildcard product matches any product, keep the NVD order
+            return [r for r in self._all_ranges if r[0][4] in [product, '*']]
+        return ranges.get(product, [])
+
     @property
     def affected_products(self):
         """The set of CPE products referred by this CVE definition"""
-        return set(cpe_product(p['id']) for p in self.each_cpe())
+        return set(self.compile_ranges())
 
     def affects(self, name, version, cve_ignore_list, cpeid=None):
         """
@@ -221,10 +640,9 @@ class CVE:
         if self.identifier in cve_ignore_list:
             return self.CVE_DOESNT_AFFECT
 
-        pkg_version = distutils.version.LooseVersion(version)
-        if not hasattr(pkg_version, "version"):
+        pkg_version = parse_version(version)
+        if pkg_version is None:
             print("Cannot parse package '%s' version '%s'" % (name, version))
-            pkg_version = None
 
         # if we don't have a cpeid, build one based on name and version
         if not cpeid:
@@ -233,20 +651,20 @@ class CVE:
         # version, as they might be different due to
         # <pkg>_CPE_ID_VERSION
         else:
-            pkg_version = distutils.version.LooseVersion(cpe_version(cpeid))
+            pkg_version = parse_version(cpe_version(cpeid))
+        cpeid_elems = cpeid.split(':')
 
-        for cpe in self.each_cpe():
-            if not cpe_matches(cpe['id'], cpeid):
+        for cpe_elems, start, end in self.product_ranges(cpeid_elems[4]):
+            if not cpe_elems_match(cpe_elems, cpeid_elems):
                 continue
-            if not cpe['v_start'] and not cpe['v_end']:
+            if not start and not end:
                 return self.CVE_AFFECTS
             if not pkg_version:
                 continue
 
-            if cpe['v_start']:
+            if start:
                 try:
-                    cve_affected_version = distutils.version.LooseVersion(cpe['v_start'])
-                    inrange = ops.get(cpe['op_start'])(pkg_version, cve_affected_version)
+                    inrange = start[0](version_cmp(pkg_version, start[1]), 0)
                 except TypeError:
                     return self.CVE_UNKNOWN
 
@@ -255,10 +673,9 @@ class CVE:
                 if not inrange:
                     continue
 
-            if cpe['v_end']:
+            if end:
                 try:
-                    cve_affected_version = distutils.version.LooseVersion(cpe['v_end'])
-                    inrange = ops.get(cpe['op_end'])(pkg_version, cve_affected_version)
+                    inrange = end[0](version_cmp(pkg_version, end[1]), 0)
                 except TypeError:
                     return self.CVE_UNKNOWN
 
@@ -271,3 +688,64 @@ class CVE:
             return self.CVE_AFFECTS
 
         return self.CVE_DOESNT_AFFECT
+
+
+def parse_nvd_year(filename):
+    """
+    Parse one yearly feed, and return the list of the (identifier,
+    compact JSON representation, affected products) tuples of its CVEs.
+    This is run by the worker processes of parse_nvd_years.
+    """
+    return [(cve.identifier, json.dumps(cve.compact(), default=str), sorted(cve.affected_products))
+            for cve in CVE.read_nvd_year(filename)]
+
+
+def parse_nvd_years(filenames, jobs=1):
+    """
+    Iterate over the parsed CVEs of each yearly feed, in order. With
+    jobs > 1, the feeds are parsed concurrently by a pool of processes,
+    and the results are merged back in order.
+    """
+    if jobs <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield parse_nvd_year(filename)
+        return
+    with multiprocessing.Pool(min(jobs, len(filenames))) as pool:
+        for cves in pool.imap(parse_nvd_year, filenames):
+            yield cves
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Maintain the local indexed NVD database')
+    parser.add_argument('--nvd-path', dest='nvd_path', required=True,
+                        help='Path to the local NVD database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    update = subparsers.add_parser('update', help='Download and ingest the outdated yearly feeds')
+    update.add_argument('-j', '--jobs', dest='jobs', type=int, default=os.cpu_count(),
+                        help='Number of feeds parsed in parallel (default: %(default)s)')
+    sync = subparsers.add_parser('sync', help='Sync the CVEs modified since the previous sync')
+    sync.add_argument('--api-url', dest='api_url', default=NVD_API_URL,
+                      help='Base URL of the NVD 2.0 CVE API (default: %(default)s)')
+    sync.add_argument('--since', dest='since', type=datetime.datetime.fromisoformat,
+                      help='Sync the CVEs modified since this ISO 8601 date instead')
+    sync.add_argument('--delay', dest='delay', type=float, default=NVD_API_DELAY,
+                      help='Seconds to wait between two requests (default: %(default)s)')
+    return parser.parse_args()
+
+
+def __main__():
+    args = parse_args()
+    if not os.path.isdir(args.nvd_path):
+        os.makedirs(args.nvd_path)
+    if args.command == 'update':
+        CVE.update_nvd_db(args.nvd_path, args.jobs)
+    elif args.command == 'sync':
+        since = args.since
+        if since and since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        count = CVE.sync_nvd_db(args.nvd_path, args.api_url, since, args.delay)
+        print("%d CVEs updated" % count)
+
+
+if __name__ == "__main__":
+    __main__()
@@ -1,9 +1,9 @@
 import re
-import subprocess
 
 import checksymbolslib.br as br
 import checksymbolslib.kconfig as kconfig
 import checksymbolslib.makefile as makefile
+from pkginfolib.inventory import get_inventory
 
 
 file_types = [
@@ -13,11 +13,7 @@ file_types = [
 
 
 def get_list_of_files_in_the_repo():
-    cmd = ['git', 'ls-files']
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout = p.communicate()[0]
-    processed_output = [str(line.decode().rstrip()) for line in stdout.splitlines() if line]
-    return processed_output
+    return list(get_inventory().tracked)
 
 
 def get_list_of_files_to_process(all_files):
@@ -6,6 +6,8 @@ import subprocess
 import sys
 import unittest
 
+from pkginfolib.inventory import get_inventory
+
 brpath = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
 
 #
@@ -140,18 +142,59 @@ class Developer:
             return 'Developer <' + name + '>'
 
 
+class DevelopersIndex:
+    """Path trie of the files listed in the DEVELOPERS file, to find the
+    developers of a path in O(path depth) rather than by matching it
+    against the files of every developer."""
+
+    def __init__(self, developers):
+        self.developers = developers
+        # Each node is a [children, dir_owners, file_owners] list, where
+        # the owners are indexes in self.developers.
+        self.root = [dict(), [], []]
+        for i, dev in enumerate(developers):
+            for f in dev.files:
+                node = self.root
+                for component in f.rstrip('/').split('/'):
+                    node = node[0].setdefault(component, [dict(), [], []])
+                # An entry ending with '/' covers the files below it, other
+                # entries cover the file itself and, for directories
+                # listed without a trailing '/', the files below it.
+                if not f.endswith('/'):
+                    node[2].append(i)
+                node[1].append(i)
+
+    def get_developers(self, f):
+        """Return the list of developers in charge of file f, in the order
+        of the DEVELOPERS file."""
+        owners = set()
+        node = self.root
+        components = f.split('/')
+        for n, component in enumerate(components):
+            node = node[0].get(component)
+            if node is None:
+                break
+            if n < len(components) - 1:
+                owners.update(node[1])
+            else:
+                owners.update(node[2])
+        return [self.developers[i] for i in sorted(owners)]
+
+    def hasfile(self, f):
+        """Return whether any developer is in charge of file f."""
+        return len(self.get_developers(f)) != 0
+
+
 def parse_developer_packages(fnames):
-    """Given a list of file patterns, travel through the Buildroot source
-    tree to find which packages are implemented by those file
-    patterns, and return a list of those packages."""
+    """Given a list of file patterns, look up in the package inventory
+    which packages are implemented by those file patterns, and return a
+    list of those packages."""
+    inventory = get_inventory()
     packages = set()
     for fname in fnames:
-        for root, dirs, files in os.walk(os.path.join(brpath, fname)):
-            for f in files:
-                path = os.path.join(root, f)
-                if fname_get_package_infra(path):
-                    pkg = os.path.splitext(f)[0]
-                    packages.add(pkg)
+        for pkg in inventory.packages_under(fname):
+            if pkg.infras:
+                packages.add(pkg.name)
     return packages
 
 
@@ -281,13 +324,5 @@ def check_developers(developers, basepath=None):
         basepath = os.getcwd()
     cmd = ["git", "--git-dir", os.path.join(basepath, ".git"), "ls-files"]
     files = subprocess.check_output(cmd).decode(sys.stdout.encoding).strip().split("\n")
-    unhandled_files = []
-    for f in files:
-        handled = False
-        for d in developers:
-            if d.hasfile(f):
-                handled = True
-                break
-        if not handled:
-            unhandled_files.append(f)
-    return unhandled_files
+    index = DevelopersIndex(developers)
+    return [f for f in files if not index.hasfile(f)]
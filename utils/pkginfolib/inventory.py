@@ -0,0 +1,257 @@
+"""Inventory of the files and packages of the Buildroot tree.
+
+Listing the packages requires walking the tree and reading every .mk file.
+The inventory does it once, and stores the result in the git directory,
+keyed on the commit checked out and the state of the working tree, so that
+the next scripts get it without walking the tree again. Outside of a git
+tree, the inventory is built from the filesystem and not stored.
+"""
+import bisect
+import hashlib
+import json
+import os
+import re
+import subprocess
+
+brpath = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+INFRA_RE = re.compile(r"\$\(eval \$\(([a-z-]*)-package\)\)")
+
+# Top-level directories containing package .mk files
+PACKAGE_DIRS = ["boot", "linux", "package", "toolchain"]
+
+CACHE_FILE = "buildroot-inventory.json"
+
+# Bump when the format of the stored inventory changes
+CACHE_VERSION = 2
+
+
+class PackageInfo:
+    """The files of a package. config_in, patches and hashes list the
+    files of the package directory and its subdirectories, except the ones
+    belonging to another package."""
+
+    def __init__(self, name, mk, infras, config_in, patches, hashes):
+        self.name = name
+        self.mk = mk
+        self.infras = infras
+        self.config_in = config_in
+        self.patches = patches
+        self.hashes = hashes
+
+    def __repr__(self):
+        return 'PackageInfo <{} ({})>'.format(self.name, self.mk)
+
+
+class Inventory:
+    """The files of the tree, and its packages. files also lists the
+    untracked files that are not ignored, while tracked only lists the
+    files known to git, as 'git ls-files' does. Outside of a git tree,
+    both list all the files."""
+
+    def __init__(self, files, packages, tracked=None):
+        self.files = files
+        self.tracked = files if tracked is None else tracked
+        self.packages = packages
+        self.by_name = dict()
+        self.by_mk = dict()
+        # Directory -> packages whose .mk is below it
+        self.by_dir = dict()
+        for p in packages:
+            self.by_name.setdefault(p.name, []).append(p)
+            self.by_mk[p.mk] = p
+            d = os.path.dirname(p.mk)
+            while d:
+                self.by_dir.setdefault(d, []).append(p)
+                d = os.path.dirname(d)
+
+    def get_packages(self, name):
+        """Return the list of packages called name (there can be several
+        .mk files with the same name)."""
+        return self.by_name.get(name, [])
+
+    def files_under(self, path):
+        """Return the files below the directory path."""
+        prefix = path.rstrip('/') + '/'
+        start = bisect.bisect_left(self.files, prefix)
+        end = bisect.bisect_left(self.files, prefix[:-1] + chr(ord('/') + 1))
+        return self.files[start:end]
+
+    def package_files(self, package):
+        """Return the files of the directory of a package and of its
+        subdirectories, except the ones of the directories of other
+        packages, e.g. the files of package/qt5/ without the ones of
+        package/qt5/qt5base/ for qt5."""
+        pkgdir = os.path.dirname(package.mk)
+        nested = {os.path.dirname(p.mk) for p in self.by_dir.get(pkgdir, [])} - {pkgdir}
+        files = []
+        for f in self.files_under(pkgdir):
+            d = os.path.dirname(f)
+            while d != pkgdir and d not in nested:
+                d = os.path.dirname(d)
+            if d == pkgdir:
+                files.append(f)
+        return files
+
+    def packages_under(self, path):
+        """Return the list of packages defined by path, which can be a .mk
+        file or a directory."""
+        if path in self.by_mk:
+            return [self.by_mk[path]]
+        return list(self.by_dir.get(path.rstrip('/'), []))
+
+
+def git(*args):
+    return subprocess.check_output(["git", "-C", brpath] + list(args),
+                                   stderr=subprocess.DEVNULL)
+
+
+def get_git_dir():
+    """Return the git directory, or None outside of a git tree."""
+    try:
+        return git("rev-parse", "--absolute-git-dir").decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_git_state():
+    """Return the git directory and a key identifying the commit checked
+    out and the state of the working tree, or (None, None) outside of a
+    git tree."""
+    try:
+        gitdir = git("rev-parse", "--absolute-git-dir").decode().strip()
+        head = git("rev-parse", "HEAD")
+        status = git("status", "--porcelain", "-z", "--untracked-files=all")
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    h = hashlib.sha1()
+    h.update(str(CACHE_VERSION).encode())
+    h.update(head)
+    h.update(status)
+    # The status only tells which files are dirty, and does not change
+    # when a modified file is modified again: add their size and mtime.
+    entries = iter(status.split(b"\0"))
+    for entry in entries:
+        if not entry:
+            continue
+        if entry[0:1] in b"RC":
+            # Renames and copies are followed by the original path
+            next(entries, None)
+        try:
+            st = os.stat(os.path.join(brpath, os.fsdecode(entry[3:])))
+        except OSError:
+            continue
+        h.update("{}:{}".format(st.st_mtime_ns, st.st_size).encode())
+    return gitdir, h.hexdigest()
+
+
+def list_files():
+    """Return a tuple of two sorted lists of files of the tree, relative to
+    the top directory: the files known to git and the untracked files
+    that are not ignored, and the files known to git only."""
+    try:
+        tracked = git("ls-files", "-z", "--cached").split(b"\0")
+        others = git("ls-files", "-z", "--others", "--exclude-standard").split(b"\0")
+        deleted = set(git("ls-files", "-z", "--deleted").split(b"\0"))
+        files = sorted({os.fsdecode(f) for f in tracked + others if f and f not in deleted})
+        return files, sorted({os.fsdecode(f) for f in tracked if f})
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    files = []
+    for root, dirs, filenames in os.walk(brpath):
+        root = os.path.relpath(root, brpath)
+        dirs[:] = [d for d in dirs if not d.startswith('.') and not (root == '.' and d == 'output')]
+        files += [os.path.normpath(os.path.join(root, f)) for f in filenames]
+    files.sort()
+    return files, files
+
+
+def get_infras(mk):
+    """Return the infrastructures evaluated by a .mk file, e.g.
+    ['autotools', 'host-autotools']."""
+    infras = []
+    try:
+        with open(os.path.join(brpath, mk), 'r', errors='surrogateescape') as f:
+            for line in f:
+                m = INFRA_RE.match(line)
+                if m:
+                    infras.append(m.group(1))
+    except OSError:
+        pass
+    return infras
+
+
+def build_inventory():
+    files, tracked = list_files()
+    makefiles = [f for f in files
+                 if f.endswith('.mk') and '/' in f and f.split('/')[0] in PACKAGE_DIRS]
+    pkgdirs = {os.path.dirname(mk): {'config_in': [], 'patches': [], 'hashes': []}
+               for mk in makefiles}
+    for f in files:
+        d = os.path.dirname(f)
+        while d and d not in pkgdirs:
+            d = os.path.dirname(d)
+        if not d:
+            continue
+        base = os.path.basename(f)
+        if base in ['Config.in', 'Config.in.host']:
+            pkgdirs[d]['config_in'].append(f)
+        elif base.endswith('.patch'):
+            pkgdirs[d]['patches'].append(f)
+        elif base.endswith('.hash'):
+            pkgdirs[d]['hashes'].append(f)
+    packages = []
+    for mk in makefiles:
+        pkgdir = pkgdirs[os.path.dirname(mk)]
+        packages.append(PackageInfo(os.path.basename(mk)[:-3], mk, get_infras(mk),
+                                    list(pkgdir['config_in']), list(pkgdir['patches']),
+                                    list(pkgdir['hashes'])))
+    return Inventory(files, packages, tracked)
+
+
+def load_inventory(filename, key):
+    try:
+        with open(filename, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('key') != key:
+        return None
+    return Inventory(data['files'], [PackageInfo(**p) for p in data['packages']], data['tracked'])
+
+
+def save_inventory(inventory, filename, key):
+    data = {
+        'key': key,
+        'files': inventory.files,
+        'tracked': inventory.tracked,
+        'packages': [p.__dict__ for p in inventory.packages],
+    }
+    try:
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(filename + '.tmp', filename)
+    except OSError:
+        pass
+
+
+_inventory = None
+
+
+def get_inventory():
+    """Return the inventory of the tree, loading it from the git directory
+    when it is up to date, or building and storing it otherwise. The
+    inventory is computed once per process."""
+    global _inventory
+    if _inventory is not None:
+        return _inventory
+    gitdir, key = get_git_state()
+    if gitdir:
+        filename = os.path.join(gitdir, CACHE_FILE)
+        _inventory = load_inventory(filename, key)
+        if _inventory is None:
+            _inventory = build_inventory()
+            save_inventory(_inventory, filename, key)
+    else:
+        _inventory = build_inventory()
+    return _inventory
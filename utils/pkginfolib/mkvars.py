@@ -0,0 +1,326 @@
+"""Static extraction of package variables from the Buildroot .mk files.
+
+Reading the variables directly from the .mk files avoids parsing the whole
+Makefile tree with 'make printvars'. Only simple assignments are handled:
+a variable that is assigned inside a conditional block, or whose value uses a
+make function or a variable defined in another file, cannot be resolved
+statically, and is reported as such so the caller can ask make for it.
+"""
+import glob
+import json
+import os
+import re
+
+from pkginfolib.inventory import get_git_dir
+
+brpath = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+ASSIGNMENT = re.compile(r"^\s*(?:override\s+)?([A-Za-z0-9_.-]+)\s*(\+=|\?=|::=|:=|=)\s*(.*)$")
+CONDITIONAL_START = re.compile(r"^\s*(ifeq|ifneq|ifdef|ifndef)\b")
+CONDITIONAL_END = re.compile(r"^\s*endif\b")
+DEFINE_START = re.compile(r"^\s*define\b")
+DEFINE_END = re.compile(r"^\s*endef\b")
+INCLUDE = re.compile(r"^\s*(-|s)?include\s")
+INFRA = re.compile(r"^\s*\$\(eval \$\(([a-z-]*)-package\)\)")
+REFERENCE = re.compile(r"\$[({]([A-Za-z0-9_.-]+)[)}]")
+
+CACHE_FILE = "buildroot-mkvars.json"
+
+# Bump when the format of the parsed makefiles changes
+CACHE_VERSION = 1
+
+CPE_ID_FIELDS = ['VENDOR', 'PRODUCT', 'VERSION', 'UPDATE', 'PREFIX']
+
+# Package infrastructures whose variables are known to be set up by
+# package/pkg-generic.mk. Packages using another infrastructure (e.g. the
+# barebox-package macro) get their variables from somewhere we do not parse.
+KNOWN_INFRAS = {os.path.basename(f)[4:-3] for f in glob.glob(os.path.join(brpath, 'package', 'pkg-*.mk'))}
+KNOWN_INFRAS.add('toolchain-external')
+
+# Package infrastructures appending a note to <pkg>_LICENSE
+VENDORING_INFRAS = ['cargo', 'golang']
+VENDORING_LICENSE = ', vendored dependencies licenses probably not listed'
+
+# The variables used by pkg-stats, with the suffix they are looked up with
+# by 'make printvars'.
+PACKAGE_VARIABLES = ['LICENSE', 'LICENSE_FILES', 'VERSION', 'IGNORE_CVES', 'CPE_ID']
+
+
+class Unresolved(Exception):
+    """Raised when the value of a variable cannot be computed statically."""
+    pass
+
+
+def read_logical_lines(filename):
+    """Return the lines of a makefile, with the continuation lines joined
+    and the comments stripped."""
+    lines = []
+    current = ''
+    with open(filename, 'r', errors='surrogateescape') as f:
+        for line in f:
+            if line.startswith('\t') and not current:
+                # Recipe line
+                continue
+            line = line.rstrip('\n')
+            if current:
+                # make replaces a backslash-newline and the surrounding
+                # whitespace by a single space
+                line = current + ' ' + line.lstrip()
+            if line.endswith('\\'):
+                current = line[:-1].rstrip()
+                continue
+            current = ''
+            comment = line.find('#')
+            if comment >= 0 and not line[:comment].endswith('\\'):
+                line = line[:comment]
+            lines.append(line)
+    return lines
+
+
+def parse_file(filename):
+    """Parse a makefile, and return a dict with:
+    - 'assignments': the list of [name, operator, value, conditional]
+      for each variable assignment, in file order;
+    - 'infras': the list of package infrastructures evaluated in the
+      file, e.g. 'autotools' or 'host-autotools';
+    - 'includes': whether the file includes other makefiles.
+    """
+    assignments = []
+    infras = []
+    includes = False
+    depth = 0
+    in_define = False
+    for line in read_logical_lines(filename):
+        if in_define:
+            if DEFINE_END.match(line):
+                in_define = False
+            continue
+        if DEFINE_START.match(line):
+            in_define = True
+            continue
+        if CONDITIONAL_START.match(line):
+            depth += 1
+            continue
+        if CONDITIONAL_END.match(line):
+            depth = max(depth - 1, 0)
+            continue
+        if INCLUDE.match(line):
+            includes = True
+            continue
+        m = INFRA.match(line)
+        if m:
+            infras.append(m.group(1))
+            continue
+        m = ASSIGNMENT.match(line)
+        if m:
+            assignments.append([m.group(1), m.group(2), m.group(3).lstrip(), depth > 0])
+    return {'assignments': assignments, 'infras': infras, 'includes': includes}
+
+
+class MkFile:
+    """The statically known variables of one makefile."""
+
+    def __init__(self, parsed):
+        self.infras = parsed['infras']
+        self.includes = parsed['includes']
+        self.values = dict()
+        self.unresolved = set()
+        for name, op, value, conditional in parsed['assignments']:
+            if conditional:
+                self.unresolved.add(name)
+            elif op == '+=':
+                if name in self.values:
+                    self.values[name] = (self.values[name] + ' ' + value).strip()
+                else:
+                    self.values[name] = value
+            elif op == '?=':
+                if name not in self.values and name not in self.unresolved:
+                    self.values[name] = value
+            else:
+                self.values[name] = value
+                self.unresolved.discard(name)
+
+    def get(self, name, depth=0):
+        """Return the expanded value of a variable, None if it is not
+        defined in this file, or raise Unresolved."""
+        if name in self.unresolved:
+            raise Unresolved(name)
+        if name not in self.values:
+            if self.includes:
+                # Might be defined in one of the included files
+                raise Unresolved(name)
+            return None
+        if depth > 16:
+            raise Unresolved(name)
+
+        def expand(m):
+            value = self.get(m.group(1), depth + 1)
+            if value is None:
+                raise Unresolved(m.group(1))
+            return value
+
+        value = REFERENCE.sub(expand, self.values[name])
+        if '$' in value:
+            # make function call, or anything else we do not handle
+            raise Unresolved(name)
+        return value
+
+    def get_infra(self, host):
+        """Return the infrastructure of the host or target variant, or None
+        if this variant is not evaluated in this file."""
+        for infra in self.infras:
+            if infra.startswith('host-') == host:
+                return infra[5:] if host else infra
+        return None
+
+
+def sanitize(version):
+    """Mimic the 'sanitize' make macro."""
+    return version.strip().replace('/', '_').replace(':', '_').replace(' ', '_')
+
+
+def variant_variables(mk, pkgvar, rawname, host):
+    """Compute the variables of a package variant as seen by 'make printvars'
+    once the package infrastructure has been evaluated, i.e. with the
+    defaults and the inheritance from the target variant set up by
+    package/pkg-generic.mk.
+
+    Return a dict of variable name to value, or to None when the value
+    cannot be computed statically.
+    """
+    own = 'HOST_' + pkgvar if host else pkgvar
+    infra = mk.get_infra(host)
+    evaluated = infra is not None
+    variables = dict()
+
+    if evaluated and infra not in KNOWN_INFRAS:
+        return {own + '_' + name: None for name in PACKAGE_VARIABLES}
+
+    def get(name):
+        value = mk.get(own + '_' + name)
+        if value is None and host and evaluated:
+            value = mk.get(pkgvar + '_' + name)
+        return value
+
+    def compute(name, func):
+        try:
+            value = func()
+        except Unresolved:
+            variables[own + '_' + name] = None
+            return
+        if value is not None:
+            variables[own + '_' + name] = value
+
+    def version():
+        if not evaluated:
+            return mk.get(own + '_VERSION')
+        value = mk.get(own + '_VERSION')
+        if not value and host:
+            value = mk.get(pkgvar + '_DL_VERSION') or mk.get(pkgvar + '_VERSION')
+        return sanitize(value) if value is not None else ''
+
+    def license():
+        if infra in VENDORING_INFRAS:
+            value = mk.get(own + '_LICENSE')
+            return value + ' ' + VENDORING_LICENSE if value else VENDORING_LICENSE
+        value = get('LICENSE')
+        if evaluated and not value:
+            return 'unknown'
+        return value
+
+    def cpe_id():
+        if not evaluated:
+            return mk.get(own + '_CPE_ID')
+        valid = mk.get(own + '_CPE_ID_VALID')
+        if any(mk.get(own + '_CPE_ID_' + f) for f in CPE_ID_FIELDS):
+            valid = 'YES'
+        if host and any(mk.get(pkgvar + '_CPE_ID_' + f) for f in CPE_ID_FIELDS):
+            valid = 'YES'
+        if not valid and host:
+            valid = mk.get(pkgvar + '_CPE_ID_VALID')
+        if valid != 'YES':
+            return mk.get(own + '_CPE_ID')
+        defaults = {
+            'VENDOR': rawname + '_project',
+            'PRODUCT': rawname,
+            'VERSION': version() or '',
+            'UPDATE': '*',
+            'PREFIX': 'cpe:2.3:a',
+        }
+        fields = {f: get('CPE_ID_' + f) or defaults[f] for f in CPE_ID_FIELDS}
+        return '{PREFIX}:{VENDOR}:{PRODUCT}:{VERSION}:{UPDATE}:*:*:*:*:*:*'.format(**fields)
+
+    compute('VERSION', version)
+    compute('LICENSE', license)
+    compute('LICENSE_FILES', lambda: get('LICENSE_FILES'))
+    compute('IGNORE_CVES', lambda: mk.get(own + '_IGNORE_CVES'))
+    compute('CPE_ID', cpe_id)
+    return variables
+
+
+class MkVarsCache:
+    """Per-file cache of the parsed makefiles, keyed on their path, mtime
+    and size. When given a filename, the parsed makefiles are loaded from
+    it, and save() stores them back, so that the makefiles that did not
+    change are not parsed again on the next run."""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.files = dict()
+        self.mkfiles = dict()
+        self.dirty = False
+        if filename:
+            try:
+                with open(filename, 'r', errors='surrogateescape') as f:
+                    data = json.load(f)
+                if data.get('version') == CACHE_VERSION:
+                    self.files = data['files']
+            except (OSError, ValueError):
+                pass
+
+    def get(self, filename):
+        st = os.stat(filename)
+        key = [st.st_mtime_ns, st.st_size]
+        entry = self.files.get(filename)
+        if entry is None or entry[:2] != key:
+            entry = key + [parse_file(filename)]
+            self.files[filename] = entry
+            self.mkfiles.pop(filename, None)
+            self.dirty = True
+        mk = self.mkfiles.get(filename)
+        if mk is None:
+            mk = self.mkfiles[filename] = MkFile(entry[2])
+        return mk
+
+    def save(self):
+        """Store the parsed makefiles that still exist, if any was parsed
+        since the cache was loaded."""
+        if not self.filename or not self.dirty:
+            return
+        files = {f: entry for f, entry in self.files.items() if os.path.exists(f)}
+        try:
+            with open(self.filename + '.tmp', 'w', errors='surrogateescape') as f:
+                json.dump({'version': CACHE_VERSION, 'files': files}, f)
+            os.replace(self.filename + '.tmp', self.filename)
+        except OSError:
+            pass
+        self.dirty = False
+
+
+def get_mkvars_cache():
+    """Return a MkVarsCache stored in the git directory, or only kept in
+    memory outside of a git tree."""
+    gitdir = get_git_dir()
+    return MkVarsCache(os.path.join(gitdir, CACHE_FILE) if gitdir else None)
+
+
+def get_package_variables(mk_filename, name, cache=None):
+    """Return the variables listed in PACKAGE_VARIABLES for the target and
+    host variants of the package 'name' defined in mk_filename, as a dict of
+    variable name to value. Variables that cannot be computed statically
+    have a None value."""
+    mk = cache.get(mk_filename) if cache else MkFile(parse_file(mk_filename))
+    pkgvar = name.upper().replace('-', '_')
+    variables = variant_variables(mk, pkgvar, name, host=True)
+    variables.update(variant_variables(mk, pkgvar, name, host=False))
+    return variables
@@ -0,0 +1,95 @@
+import pytest
+import pkginfolib.inventory as m
+
+
+def test_build_inventory():
+    inventory = m.build_inventory()
+    assert 'Makefile' in inventory.files
+    assert 'package/Config.in' in inventory.files
+    assert inventory.files == sorted(inventory.files)
+    assert len(inventory.packages) > 1000
+
+
+def test_get_packages():
+    inventory = m.get_inventory()
+    [busybox] = inventory.get_packages('busybox')
+    assert busybox.mk == 'package/busybox/busybox.mk'
+    assert busybox.infras == ['kconfig']
+    assert busybox.config_in == ['package/busybox/Config.in']
+    assert busybox.hashes == ['package/busybox/busybox.hash']
+    assert all(p.startswith('package/busybox/') and p.endswith('.patch') for p in busybox.patches)
+    assert inventory.get_packages('not-a-package') == []
+
+
+def test_subpackage_files():
+    inventory = m.get_inventory()
+    [qt5] = inventory.get_packages('qt5')
+    [qt5base] = inventory.get_packages('qt5base')
+    assert 'package/qt5/qt5base/Config.in' not in qt5.config_in
+    assert 'package/qt5/qt5base/Config.in' in qt5base.config_in
+
+
+files_under = [
+    ('directory',
+     ['a/b', 'a/b/c', 'a/b/d/e', 'a/bc', 'a/b.mk'],
+     'a/b',
+     ['a/b/c', 'a/b/d/e']),
+    ('trailing slash',
+     ['a/b', 'a/b/c', 'a/bc'],
+     'a/b/',
+     ['a/b/c']),
+    ('not found',
+     ['a/b', 'a/b/c'],
+     'c',
+     []),
+    ]
+
+
+@pytest.mark.parametrize('testname,files,path,expected', files_under)
+def test_files_under(testname, files, path, expected):
+    inventory = m.Inventory(sorted(files), [])
+    assert inventory.files_under(path) == expected
+
+
+packages_under = [
+    ('mk file', 'package/busybox/busybox.mk', {'busybox'}),
+    ('directory', 'package/busybox/', {'busybox'}),
+    ('parent directory', 'package/qt5', {'qt5', 'qt5base'}),
+    ('not a package', 'support/scripts/', set()),
+    ]
+
+
+@pytest.mark.parametrize('testname,path,expected', packages_under)
+def test_packages_under(testname, path, expected):
+    inventory = m.get_inventory()
+    names = {p.name for p in inventory.packages_under(path)}
+    assert expected <= names
+    if not expected:
+        assert names == set()
+
+
+def test_cache(tmp_path):
+    inventory = m.build_inventory()
+    filename = str(tmp_path / 'inventory.json')
+    m.save_inventory(inventory, filename, 'key')
+    assert m.load_inventory(filename, 'other-key') is None
+    loaded = m.load_inventory(filename, 'key')
+    assert loaded.files == inventory.files
+    assert loaded.tracked == inventory.tracked
+    assert [p.__dict__ for p in loaded.packages] == [p.__dict__ for p in inventory.packages]
+
+
+def test_tracked_files():
+    inventory = m.build_inventory()
+    assert inventory.tracked == sorted(m.git("ls-files").decode().splitlines())
+    assert set(inventory.tracked) - set(inventory.files) <= set(m.git("ls-files", "--deleted").decode().splitlines())
+
+
+def test_package_files():
+    inventory = m.get_inventory()
+    files = inventory.package_files(inventory.by_mk['package/qt5/qt5.mk'])
+    assert 'package/qt5/qt5.mk' in files
+    assert 'package/qt5/Config.in' in files
+    assert not any(f.startswith('package/qt5/qt5base/') for f in files)
+    files = inventory.package_files(inventory.by_mk['package/qt5/qt5base/qt5base.mk'])
+    assert 'package/qt5/qt5base/qt5base.mk' in files
@@ -0,0 +1,183 @@
+import os
+import pytest
+import tempfile
+import pkginfolib.mkvars as m
+
+
+def write_mk(content):
+    f = tempfile.NamedTemporaryFile(mode='w', suffix='.mk', delete=False)
+    f.write(content)
+    f.close()
+    return f.name
+
+
+read_logical_lines = [
+    ('continuation',
+     'FOO_LICENSE = GPL-2.0, \\\n\tMIT\n',
+     ['FOO_LICENSE = GPL-2.0, MIT']),
+    ('comment',
+     'FOO_LICENSE = GPL # no version\n',
+     ['FOO_LICENSE = GPL ']),
+    ('recipe',
+     'foo:\n\techo $(FOO_VERSION)\n',
+     ['foo:']),
+    ]
+
+
+@pytest.mark.parametrize('testname,content,expected', read_logical_lines)
+def test_read_logical_lines(testname, content, expected):
+    filename = write_mk(content)
+    lines = m.read_logical_lines(filename)
+    os.unlink(filename)
+    assert lines == expected
+
+
+get_package_variables = [
+    ('simple',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'FOO_LICENSE = MIT\n'
+     'FOO_LICENSE_FILES = COPYING\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': 'MIT',
+      'FOO_LICENSE_FILES': 'COPYING'}),
+    ('reference',
+     'foo',
+     'FOO_VERSION_MAJOR = 1\n'
+     'FOO_VERSION = $(FOO_VERSION_MAJOR).2\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.2',
+      'FOO_LICENSE': 'unknown'}),
+    ('sanitized version',
+     'foo',
+     'FOO_VERSION = remotes/origin/stable\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': 'remotes_origin_stable',
+      'FOO_LICENSE': 'unknown'}),
+    ('append',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'FOO_LICENSE = MIT\n'
+     'FOO_LICENSE += , BSD-3-Clause\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': 'MIT , BSD-3-Clause'}),
+    ('conditional',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'FOO_LICENSE = MIT\n'
+     'ifeq ($(BR2_PACKAGE_FOO_BAR),y)\n'
+     'FOO_LICENSE += , BSD-3-Clause\n'
+     'endif\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': None}),
+    ('make function',
+     'foo',
+     'FOO_VERSION = $(call qstrip,$(BR2_PACKAGE_FOO_VERSION))\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': None,
+      'FOO_LICENSE': 'unknown'}),
+    ('define',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'define FOO_INSTALL_TARGET_CMDS\n'
+     'FOO_VERSION = 2.0\n'
+     'endef\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': 'unknown'}),
+    ('include',
+     'foo',
+     'include package/foo/foo.inc\n'
+     'FOO_VERSION = 1.0\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': None,
+      'FOO_LICENSE_FILES': None,
+      'FOO_IGNORE_CVES': None,
+      'FOO_CPE_ID': None,
+      'HOST_FOO_VERSION': None,
+      'HOST_FOO_LICENSE': None,
+      'HOST_FOO_LICENSE_FILES': None,
+      'HOST_FOO_IGNORE_CVES': None,
+      'HOST_FOO_CPE_ID': None}),
+    ('host inherits target',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'FOO_LICENSE = MIT\n'
+     '$(eval $(generic-package))\n'
+     '$(eval $(host-generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': 'MIT',
+      'HOST_FOO_VERSION': '1.0',
+      'HOST_FOO_LICENSE': 'MIT'}),
+    ('host only',
+     'foo',
+     'HOST_FOO_VERSION = 1.0\n'
+     'FOO_LICENSE = MIT\n'
+     '$(eval $(host-generic-package))\n',
+     {'FOO_LICENSE': 'MIT',
+      'HOST_FOO_VERSION': '1.0',
+      'HOST_FOO_LICENSE': 'MIT'}),
+    ('cpe id',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'FOO_CPE_ID_VENDOR = bar\n'
+     '$(eval $(generic-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': 'unknown',
+      'FOO_CPE_ID': 'cpe:2.3:a:bar:foo:1.0:*:*:*:*:*:*:*'}),
+    ('vendoring infra',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     'FOO_LICENSE = MIT\n'
+     '$(eval $(golang-package))\n',
+     {'FOO_VERSION': '1.0',
+      'FOO_LICENSE': 'MIT , vendored dependencies licenses probably not listed'}),
+    ('unknown infra',
+     'foo',
+     'FOO_VERSION = 1.0\n'
+     '$(eval $(foo-package))\n',
+     {'FOO_VERSION': None,
+      'FOO_LICENSE': None,
+      'FOO_LICENSE_FILES': None,
+      'FOO_IGNORE_CVES': None,
+      'FOO_CPE_ID': None}),
+    ]
+
+
+@pytest.mark.parametrize('testname,name,content,expected', get_package_variables)
+def test_get_package_variables(testname, name, content, expected):
+    filename = write_mk(content)
+    variables = m.get_package_variables(filename, name)
+    os.unlink(filename)
+    assert variables == expected
+
+
+def test_mkvarscache():
+    filename = write_mk('FOO_VERSION = 1.0\n$(eval $(generic-package))\n')
+    cache = m.MkVarsCache()
+    assert m.get_package_variables(filename, 'foo', cache)['FOO_VERSION'] == '1.0'
+    with open(filename, 'w') as f:
+        f.write('FOO_VERSION = 1.10\n$(eval $(generic-package))\n')
+    assert m.get_package_variables(filename, 'foo', cache)['FOO_VERSION'] == '1.10'
+    os.unlink(filename)
+
+
+def test_mkvarscache_persistent(tmp_path):
+    filename = write_mk('FOO_VERSION = 1.0\n$(eval $(generic-package))\n')
+    cache_file = str(tmp_path / 'mkvars.json')
+    cache = m.MkVarsCache(cache_file)
+    assert m.get_package_variables(filename, 'foo', cache)['FOO_VERSION'] == '1.0'
+    cache.save()
+    cache = m.MkVarsCache(cache_file)
+    assert filename in cache.files
+    assert m.get_package_variables(filename, 'foo', cache)['FOO_VERSION'] == '1.0'
+    assert not cache.dirty
+    with open(filename, 'w') as f:
+        f.write('FOO_VERSION = 1.10\n$(eval $(generic-package))\n')
+    assert m.get_package_variables(filename, 'foo', cache)['FOO_VERSION'] == '1.10'
+    assert cache.dirty
+    os.unlink(filename)